@@ -4,37 +4,135 @@ Web UI for uploading, cropping, and cycling photos on e-ink display.
 """
 
 import os
-import json
-import time
+import copy
+import queue
+import shutil
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from werkzeug.utils import secure_filename
-from PIL import Image
+from PIL import ExifTags, Image, ImageOps
 import io
 import base64
+import orjson
+
+try:
+    from inky.auto import auto as inky_auto
+except ImportError:
+    inky_auto = None  # dev mode, no display hardware
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']  # HTML/JSON only; images are sent as-is
+Compress(app)
 
 # Paths
 DATA_DIR = Path(os.environ.get('DATA_DIR', '/app/data'))
 PHOTOS_DIR = DATA_DIR / 'photos'
 ORIGINALS_DIR = DATA_DIR / 'originals'
+THUMBS_DIR = DATA_DIR / 'thumbs'
+RENDERS_DIR = DATA_DIR / 'renders'
 CONFIG_FILE = DATA_DIR / 'config.json'
 
 # Display settings for Inky Impression 7.3"
 DISPLAY_WIDTH = 800
 DISPLAY_HEIGHT = 480
 
+# Photo file types shown in the gallery and cycled on the display
+PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
+
+# 7-colour ACeP palettes in panel index order (black, white, green, blue,
+# red, yellow, orange), as each inky driver blends them at its default
+# saturation of 0.5. These drivers' set_image() accepts an image already
+# indexed to their palette.
+INKY_PALETTES = {
+    'inky_ac073tc1a': [  # Impression 7.3"
+        (0, 0, 0),
+        (236, 248, 255),
+        (1, 189, 38),
+        (13, 23, 226),
+        (250, 40, 17),
+        (255, 255, 34),
+        (247, 130, 22),
+    ],
+    'inky_uc8159': [  # Impression 4" and 5.7"
+        (28, 24, 28),
+        (255, 255, 255),
+        (29, 173, 35),
+        (30, 29, 174),
+        (205, 36, 37),
+        (231, 222, 35),
+        (216, 123, 36),
+    ],
+}
+
+
+def _make_palette_image(colours):
+    """Build a 'P' image to quantize against, holding only the given colours."""
+    palette_image = Image.new('P', (1, 1))
+    palette_image.putpalette([c for colour in colours for c in colour])
+    return palette_image
+
+
+_palette_images = {driver: _make_palette_image(colours)
+                   for driver, colours in INKY_PALETTES.items()}
+
 # Ensure directories exist
 PHOTOS_DIR.mkdir(parents=True, exist_ok=True)
 ORIGINALS_DIR.mkdir(parents=True, exist_ok=True)
+THUMBS_DIR.mkdir(parents=True, exist_ok=True)
+RENDERS_DIR.mkdir(parents=True, exist_ok=True)
 
 # Global state
 display_thread = None
 stop_event = threading.Event()
+config_changed = threading.Event()  # set when cycle settings are saved
+
+# Photos waiting to be shown; a single worker drives the display so
+# refreshes never overlap on the SPI bus
+display_queue = queue.Queue(maxsize=4)
+display_worker_thread = None
+
+# Upload post-processing (thumbnails, display renders). Pillow releases the
+# GIL while decoding and resizing, so threads run in parallel; leave a core
+# free for requests.
+background_pool = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1),
+                                     thread_name_prefix='background')
+
+# Inky display, probed once on first use
+_inky_display = None
+_inky_lock = threading.Lock()
+
+# Config keys that affect the cycle thread's schedule
+CYCLE_SETTINGS = ('cycle_enabled', 'cycle_interval')
+
+# Parsed config.json, reloaded only when the file's mtime changes
+_config_cache = {'mtime': 0, 'data': None}
+_config_lock = threading.Lock()
+
+# Prepared display images, keyed by (path, mtime_ns, width, height, palette)
+PREPARED_CACHE_SIZE = 16
+_prepared_cache = OrderedDict()
+_prepared_pending = set()
+_prepared_cond = threading.Condition()
 
 
 def load_config():
@@ -46,23 +144,40 @@ def load_config():
         'orientation': 'landscape',  # landscape or portrait
         'photo_order': [],
     }
-    if CONFIG_FILE.exists():
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                for key, value in default_config.items():
-                    if key not in config:
-                        config[key] = value
-                return config
-        except Exception as e:
-            print(f"Error loading config: {e}")
-    return default_config
+    try:
+        mtime = CONFIG_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = 0
+    with _config_lock:
+        if _config_cache['data'] is None or _config_cache['mtime'] != mtime:
+            if not mtime:
+                return default_config
+            try:
+                with open(CONFIG_FILE, 'rb') as f:
+                    _config_cache['data'] = orjson.loads(f.read())
+                    _config_cache['mtime'] = mtime
+            except Exception as e:
+                print(f"Error loading config: {e}")
+                return default_config
+        config = copy.deepcopy(_config_cache['data'])
+    for key, value in default_config.items():
+        if key not in config:
+            config[key] = value
+    return config
 
 
 def save_config(config):
     """Save configuration to file."""
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    with _config_lock:
+        previous = _config_cache['data'] or {}
+        # Write then rename, so a crash mid-write can't leave a truncated file
+        tmp_file = CONFIG_FILE.with_name(CONFIG_FILE.name + '.tmp')
+        tmp_file.write_bytes(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, CONFIG_FILE)
+        _config_cache['data'] = copy.deepcopy(config)
+        _config_cache['mtime'] = CONFIG_FILE.stat().st_mtime_ns
+    if any(config.get(key) != previous.get(key) for key in CYCLE_SETTINGS):
+        config_changed.set()
 
 
 def get_display_dimensions(orientation):
@@ -74,33 +189,250 @@ def get_display_dimensions(orientation):
 
 def get_photos():
     """Get list of all photos."""
-    photos = []
-    for ext in ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.bmp']:
-        photos.extend(PHOTOS_DIR.glob(ext))
-        photos.extend(PHOTOS_DIR.glob(ext.upper()))
-    return sorted(photos, key=lambda x: x.stat().st_mtime, reverse=True)
+    with os.scandir(PHOTOS_DIR) as it:
+        entries = [e for e in it
+                   if e.is_file() and os.path.splitext(e.name)[1].lower() in PHOTO_EXTENSIONS]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    return [Path(e.path) for e in entries]
+
+
+def get_cached_files(cache_dir, photo_name):
+    """Get all cached files derived from a photo, including stale ones.
+    
+    Cache files are named '<photo name>-<key>' where the key has no '-'.
+    """
+    return [p for p in cache_dir.glob(f'{photo_name}-*')
+            if p.name.rsplit('-', 1)[0] == photo_name]
+
+
+def get_cache_mtime(cache_path):
+    """Get the source mtime_ns a cache file's key starts with, if any."""
+    key = cache_path.name.rsplit('-', 1)[1]
+    digits = key.split('_', 1)[0].split('.', 1)[0]
+    return int(digits) if digits.isdigit() else None
+
+
+def write_cached_image(img, cache_path, *args, **kwargs):
+    """Save an image to a cache file, then prune the photo's stale entries.
+    
+    Only entries for older source mtimes are removed; in-flight temporary
+    files and other entries for the current mtime are left alone, so
+    concurrent writers of the same key don't delete each other's files.
+    """
+    tmp_path = cache_path.with_name(f'{cache_path.name}.{threading.get_ident()}.tmp')
+    img.save(tmp_path, *args, **kwargs)
+    os.replace(tmp_path, cache_path)
+    
+    photo_name = cache_path.name.rsplit('-', 1)[0]
+    current_mtime = get_cache_mtime(cache_path)
+    for stale_path in get_cached_files(cache_path.parent, photo_name):
+        if stale_path == cache_path or stale_path.suffix == '.tmp':
+            continue
+        stale_mtime = get_cache_mtime(stale_path)
+        if stale_mtime is not None and stale_mtime < current_mtime:
+            stale_path.unlink(missing_ok=True)
+
+
+def has_transparency(img):
+    """Check whether an image carries an alpha channel or transparent colour."""
+    return img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+
+
+def flatten_to_rgb(img):
+    """Convert an image to RGB, compositing any transparency onto white."""
+    if img.mode == 'RGB':
+        return img
+    if has_transparency(img):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def make_thumbnail(photo_path):
+    """Get a photo's cached preview thumbnail, creating it if needed.
+    
+    Returns the thumbnail path and its mimetype.
+    """
+    photo_path = Path(photo_path)
+    # Thumbnails are cached on disk per source mtime, so edits get a new one
+    # ('_upright' marks thumbnails with EXIF orientation applied)
+    thumb_name = f'{photo_path.name}-{photo_path.stat().st_mtime_ns}_upright'
+    for ext, mimetype in (('.jpg', 'image/jpeg'), ('.webp', 'image/webp')):
+        thumb_path = THUMBS_DIR / (thumb_name + ext)
+        if thumb_path.exists():
+            return thumb_path, mimetype
+    
+    img = Image.open(photo_path)
+    img.thumbnail((200, 200), Image.Resampling.LANCZOS)
+    # Match the display, which honours EXIF orientation
+    ImageOps.exif_transpose(img, in_place=True)
+    
+    # JPEG encodes fastest for photos; WebP keeps transparency
+    if has_transparency(img):
+        thumb_path, mimetype = THUMBS_DIR / (thumb_name + '.webp'), 'image/webp'
+        write_cached_image(img, thumb_path, 'WEBP', quality=80, method=4)
+    else:
+        thumb_path, mimetype = THUMBS_DIR / (thumb_name + '.jpg'), 'image/jpeg'
+        write_cached_image(flatten_to_rgb(img), thumb_path, 'JPEG', quality=75)
+    return thumb_path, mimetype
+
+
+def pregenerate_thumbnail(photo_path):
+    """Create a newly uploaded photo's preview thumbnail ahead of time."""
+    try:
+        make_thumbnail(photo_path)
+    except Exception as e:
+        print(f"Error creating thumbnail: {e}")
+
+
+def _render_display_image(photo_path, width, height, palette=None):
+    """Open, rotate and resize a photo to the given display dimensions.
+    
+    With a palette (an INKY_PALETTES driver), the result is dithered to
+    that driver's colours as a 'P' image.
+    """
+    img = Image.open(photo_path)
+    img_width, img_height = img.size
+    
+    # EXIF orientation 5-8 (e.g. phone photos) means the stored axes are swapped
+    swap_axes = img.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8)
+    if swap_axes:
+        img_width, img_height = img_height, img_width
+    
+    # Detect if image is portrait (taller than wide)
+    is_portrait = img_height > img_width
+    
+    # Size to resize to before rotating portrait images onto the display
+    if is_portrait:
+        target_width, target_height = height, width
+    else:
+        target_width, target_height = width, height
+    
+    # Let JPEGs decode at a reduced scale, keeping 2x headroom for LANCZOS
+    # (no-op for other formats)
+    if swap_axes:
+        img.draft('RGB', (target_height * 2, target_width * 2))
+    else:
+        img.draft('RGB', (target_width * 2, target_height * 2))
+    ImageOps.exif_transpose(img, in_place=True)
+    
+    # Resize in RGB: one channel fewer than RGBA, and Pillow falls back
+    # to NEAREST when resizing palette images
+    img = flatten_to_rgb(img)
+    
+    img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
+    
+    if is_portrait:
+        # Rotate portrait image 90° CCW so it displays correctly
+        # when the display is physically rotated to portrait orientation.
+        # Done after resizing, so only display-sized pixels are moved.
+        img = img.transpose(Image.Transpose.ROTATE_90)
+    
+    if palette:
+        img = img.quantize(palette=_palette_images[palette],
+                           dither=Image.Dither.FLOYDSTEINBERG)
+    return img
+
+
+def prepare_display_image(photo_path, width, height, palette=None):
+    """Get a photo prepared for the display, reusing cached renders.
+    
+    The returned image is shared between callers and must not be modified.
+    Concurrent requests for the same photo wait for a single render.
+    """
+    photo_path = Path(photo_path)
+    mtime_ns = photo_path.stat().st_mtime_ns
+    key = (str(photo_path), mtime_ns, width, height, palette)
+    
+    with _prepared_cond:
+        while key in _prepared_pending:
+            _prepared_cond.wait()
+        if key in _prepared_cache:
+            _prepared_cache.move_to_end(key)
+            return _prepared_cache[key]
+        _prepared_pending.add(key)
+    
+    # Renders are also kept on disk, so they survive restarts and can be
+    # prepared ahead of time at upload
+    mode = palette or 'rgb'
+    cache_path = RENDERS_DIR / f'{photo_path.name}-{mtime_ns}_{width}x{height}_{mode}.png'
+    
+    img = None
+    try:
+        if cache_path.exists():
+            img = Image.open(cache_path)
+            img.load()
+        else:
+            img = _render_display_image(photo_path, width, height, palette)
+            write_cached_image(img, cache_path, 'PNG', compress_level=1)
+    finally:
+        with _prepared_cond:
+            _prepared_pending.discard(key)
+            if img is not None:
+                _prepared_cache[key] = img
+                while len(_prepared_cache) > PREPARED_CACHE_SIZE:
+                    _prepared_cache.popitem(last=False)
+            _prepared_cond.notify_all()
+    return img
+
+
+def evict_prepared_images(photo_path):
+    """Drop a photo's in-memory display renders, for all mtimes and sizes."""
+    with _prepared_cond:
+        for key in [k for k in _prepared_cache if k[0] == str(photo_path)]:
+            del _prepared_cache[key]
+
+
+def get_inky_display():
+    """Get the Inky display, auto-detecting it on first use."""
+    global _inky_display
+    with _inky_lock:
+        if _inky_display is None:
+            if inky_auto is None:
+                raise ImportError("inky library not available")
+            _inky_display = inky_auto()
+        return _inky_display
+
+
+def prepare_inky_image(inky_display, photo_path):
+    """Get a photo prepared for a specific Inky display."""
+    # Dither once here (and cache it) rather than on every set_image()
+    driver = type(inky_display).__module__.rsplit('.', 1)[-1]
+    palette = driver if driver in INKY_PALETTES else None
+    return prepare_display_image(photo_path, inky_display.width, inky_display.height,
+                                 palette=palette)
+
+
+def prerender_photo(photo_path):
+    """Prepare a newly uploaded photo for the display ahead of time."""
+    try:
+        prepare_inky_image(get_inky_display(), photo_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Error pre-rendering photo: {e}")
+
+
+def inky_available():
+    """Check whether an Inky display is connected, probing it if needed."""
+    try:
+        get_inky_display()
+        return True
+    except ImportError:
+        return False
+    except Exception as e:
+        print(f"Error detecting display: {e}")
+        return False
 
 
 def display_photo(photo_path):
     """Display a photo on the Inky Impression."""
     try:
-        from inky.auto import auto
-        
-        inky_display = auto()
-        
-        img = Image.open(photo_path)
-        img_width, img_height = img.size
+        inky_display = get_inky_display()
         
-        # Detect if image is portrait (taller than wide)
-        is_portrait = img_height > img_width
-        
-        if is_portrait:
-            # Rotate portrait image 90° CCW so it displays correctly
-            # when the display is physically rotated to portrait orientation
-            img = img.rotate(90, expand=True)
-        
-        # Now resize to fit display's native dimensions
-        img = img.resize((inky_display.width, inky_display.height), Image.Resampling.LANCZOS)
+        img = prepare_inky_image(inky_display, photo_path)
         
         if hasattr(inky_display, 'set_image'):
             inky_display.set_image(img)
@@ -115,34 +447,46 @@ def display_photo(photo_path):
     return True
 
 
+def wait_for_config_change(timeout):
+    """Sleep until cycle settings change, a stop is requested, or any timeout."""
+    if config_changed.wait(timeout=timeout):
+        config_changed.clear()
+
+
 def cycle_photos():
     """Background thread to cycle through photos."""
     config = load_config()
     photo_index = 0
+    last_shown = None  # monotonic time the current photo was queued
     
     while not stop_event.is_set():
         config = load_config()
         
         if not config.get('cycle_enabled'):
-            time.sleep(1)
+            # Only a settings change can re-enable cycling
+            last_shown = None
+            wait_for_config_change(timeout=None)
             continue
         
+        # A settings change wakes us early; keep the current photo until
+        # the (possibly new) interval has elapsed since it was shown
+        if last_shown is not None:
+            interval = config.get('cycle_interval', 3600)
+            remaining = interval - (time.monotonic() - last_shown)
+            if remaining > 0:
+                wait_for_config_change(timeout=remaining)
+                continue
+        
         photos = get_photos()
         if not photos:
-            time.sleep(1)
+            wait_for_config_change(timeout=60)
             continue
         
         order = config.get('photo_order', [])
         if order:
-            ordered_photos = []
-            for name in order:
-                for p in photos:
-                    if p.name == name:
-                        ordered_photos.append(p)
-                        break
-            for p in photos:
-                if p not in ordered_photos:
-                    ordered_photos.append(p)
+            by_name = {p.name: p for p in photos}
+            ordered_photos = [by_name.pop(name) for name in order if name in by_name]
+            ordered_photos.extend(by_name.values())
             photos = ordered_photos
         
         if photo_index >= len(photos):
@@ -152,12 +496,10 @@ def cycle_photos():
         config['current_photo'] = current_photo.name
         save_config(config)
         
-        display_photo(current_photo)
+        display_queue.put(current_photo)
+        last_shown = time.monotonic()
         
         photo_index += 1
-        
-        interval = config.get('cycle_interval', 3600)
-        stop_event.wait(timeout=interval)
 
 
 def start_cycle_thread():
@@ -169,6 +511,33 @@ def start_cycle_thread():
         display_thread.start()
 
 
+def stop_cycle_thread():
+    """Stop the photo cycling thread, waking it if it is waiting."""
+    stop_event.set()
+    config_changed.set()
+    if display_thread is not None:
+        display_thread.join()
+
+
+def display_worker():
+    """Background thread that shows queued photos one at a time."""
+    while True:
+        photo_path = display_queue.get()
+        try:
+            display_photo(photo_path)
+        finally:
+            display_queue.task_done()
+
+
+def start_display_worker():
+    """Start the display worker thread."""
+    global display_worker_thread
+    if display_worker_thread is None or not display_worker_thread.is_alive():
+        display_worker_thread = threading.Thread(target=display_worker, daemon=True)
+        display_worker_thread.start()
+
+
+start_display_worker()
 start_cycle_thread()
 
 
@@ -209,12 +578,16 @@ def api_config():
 @app.route('/api/photos', methods=['GET'])
 def api_photos():
     """List all photos."""
-    photos = get_photos()
-    return jsonify([{
-        'name': p.name,
-        'size': p.stat().st_size,
-        'modified': datetime.fromtimestamp(p.stat().st_mtime).isoformat()
-    } for p in photos])
+    photos = []
+    for p in get_photos():
+        st = p.stat()
+        photos.append({
+            'name': p.name,
+            'size': st.st_size,
+            # orjson writes datetimes in the same ISO format as isoformat()
+            'modified': datetime.fromtimestamp(st.st_mtime),
+        })
+    return jsonify(photos)
 
 
 @app.route('/api/photos/upload', methods=['POST'])
@@ -236,35 +609,56 @@ def api_upload():
     original_filepath = ORIGINALS_DIR / filename
     file.save(original_filepath)
     
-    # Also save a copy to photos directory for immediate display
+    # Also link (or copy) it into photos directory for immediate display
     display_filepath = PHOTOS_DIR / filename
-    with open(original_filepath, 'rb') as src:
-        with open(display_filepath, 'wb') as dst:
-            dst.write(src.read())
+    # A same-name upload within a second has already rewritten a shared link
+    if not (display_filepath.exists()
+            and os.path.samefile(original_filepath, display_filepath)):
+        display_filepath.unlink(missing_ok=True)
+        try:
+            os.link(original_filepath, display_filepath)
+        except OSError:
+            shutil.copyfile(original_filepath, display_filepath)
+    
+    background_pool.submit(pregenerate_thumbnail, display_filepath)
+    background_pool.submit(prerender_photo, display_filepath)
     
     return jsonify({'name': filename, 'success': True})
 
 
 @app.route('/api/photos/upload-cropped', methods=['POST'])
 def api_upload_cropped():
-    """Upload a cropped photo from the crop tool."""
-    data = request.json
-    if not data or 'image' not in data:
-        return jsonify({'error': 'No image data provided'}), 400
-    
-    image_data = data['image']
-    if ',' in image_data:
-        image_data = image_data.split(',')[1]
+    """Upload a cropped photo from the crop tool.
     
-    image_bytes = base64.b64decode(image_data)
-    img = Image.open(io.BytesIO(image_bytes))
+    Accepts the PNG as a multipart 'image' file, or as a base64 data URL
+    in a JSON body.
+    """
+    upload = request.files.get('image')
+    if upload:
+        # Read the header only; PNGs are stored as sent, others re-encoded below
+        try:
+            img = Image.open(upload.stream)
+        except Exception:
+            return jsonify({'error': 'Invalid image data'}), 400
+        data = request.form
+        is_recrop = data.get('is_recrop', 'false').lower() == 'true'
+    else:
+        data = request.json
+        if not data or 'image' not in data:
+            return jsonify({'error': 'No image data provided'}), 400
+        
+        # Skip any "data:image/png;base64," prefix without splitting the payload
+        image_data = data['image']
+        image_bytes = base64.b64decode(image_data[image_data.find(',', 0, 64) + 1:])
+        img = Image.open(io.BytesIO(image_bytes))
+        is_recrop = data.get('is_recrop', False)
     
     # Use original filename or create new one if cropping a fresh upload
     filename = data.get('filename', 'cropped')
     
     # If this is from an existing photo (re-cropping), use the same filename
     # If this is a new upload being cropped, generate timestamped name
-    if data.get('is_recrop', False):
+    if is_recrop:
         # Re-cropping existing photo - use exact filename to overwrite
         final_filename = filename
     else:
@@ -274,7 +668,21 @@ def api_upload_cropped():
         final_filename = f"{secure_filename(name)}_{timestamp}.png"
     
     filepath = PHOTOS_DIR / final_filename
-    img.save(filepath, 'PNG')
+    # Write then rename so a hard-linked original is replaced, not overwritten
+    tmp_filepath = filepath.with_name(filepath.name + '.tmp')
+    if img.format != 'PNG':
+        img.save(tmp_filepath, 'PNG')
+    elif upload:
+        # Already a PNG, so store the uploaded bytes without re-encoding
+        upload.stream.seek(0)
+        upload.save(tmp_filepath)
+    else:
+        tmp_filepath.write_bytes(image_bytes)
+    os.replace(tmp_filepath, filepath)
+    evict_prepared_images(filepath)
+    
+    background_pool.submit(pregenerate_thumbnail, filepath)
+    background_pool.submit(prerender_photo, filepath)
     
     return jsonify({'name': final_filename, 'success': True})
 
@@ -298,6 +706,12 @@ def api_delete_photo(filename):
         original_filepath.unlink()
         deleted_any = True
     
+    # Delete cached thumbnails and display renders
+    evict_prepared_images(display_filepath)
+    for cache_dir in (THUMBS_DIR, RENDERS_DIR):
+        for cache_path in get_cached_files(cache_dir, secure_name):
+            cache_path.unlink(missing_ok=True)
+    
     if deleted_any:
         return jsonify({'success': True})
     return jsonify({'error': 'File not found'}), 404
@@ -305,29 +719,49 @@ def api_delete_photo(filename):
 
 @app.route('/api/display/<filename>', methods=['POST'])
 def api_display_photo(filename):
-    """Display a specific photo immediately."""
+    """Queue a specific photo to be displayed immediately.
+    
+    The refresh runs on the display worker; this returns 202 once queued.
+    """
     filepath = PHOTOS_DIR / secure_filename(filename)
     if not filepath.exists():
         return jsonify({'error': 'File not found'}), 404
     
+    has_display = inky_available()
+    if has_display:
+        try:
+            display_queue.put_nowait(filepath)
+        except queue.Full:
+            return jsonify({'error': 'Display is busy, try again shortly'}), 503
+    
+    # Only record the photo once it's actually going to be shown
     config = load_config()
     config['current_photo'] = filename
     save_config(config)
     
-    success = display_photo(filepath)
-    return jsonify({'success': success, 'displayed': filename})
+    if not has_display:
+        print("Inky library not available - running in dev mode")
+        return jsonify({'success': False, 'displayed': filename})
+    return jsonify({'success': True, 'queued': True, 'displayed': filename}), 202
 
 
 @app.route('/photos/<filename>')
 def serve_photo(filename):
     """Serve a photo file."""
-    return send_from_directory(PHOTOS_DIR, filename)
+    response = send_from_directory(PHOTOS_DIR, filename)
+    # Re-cropping rewrites photos in place, so always revalidate (cheap 304s)
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/api/photos/original/<filename>')
 def serve_original_photo(filename):
     """Serve an original photo file for editing."""
-    return send_from_directory(ORIGINALS_DIR, filename)
+    # A same-name upload within a second rewrites the original, so always
+    # revalidate (cheap 304s)
+    response = send_from_directory(ORIGINALS_DIR, filename)
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/api/preview/<filename>')
@@ -337,14 +771,8 @@ def api_preview(filename):
     if not filepath.exists():
         return jsonify({'error': 'File not found'}), 404
     
-    img = Image.open(filepath)
-    img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-    
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    b64 = base64.b64encode(buffer.getvalue()).decode()
-    
-    return jsonify({'thumbnail': f'data:image/png;base64,{b64}'})
+    thumb_path, mimetype = make_thumbnail(filepath)
+    return send_file(thumb_path, mimetype=mimetype, max_age=300)
 
 
 if __name__ == '__main__':